@@ -0,0 +1,75 @@
+import functools
+import inspect
+import json
+import logging
+import os
+from typing import get_type_hints
+
+import redis
+from dotenv import load_dotenv
+from pydantic import parse_raw_as
+from pydantic.json import pydantic_encoder
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Bỏ trống REDIS_URL để tắt cache, các hàm đọc sẽ truy vấn thẳng CSDL
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Timeout ngắn để khi Redis không phản hồi, request chuyển sang CSDL thay vì chờ timeout TCP của hệ điều hành
+REDIS_SOCKET_TIMEOUT = 0.2
+
+redis_client = (
+    redis.Redis.from_url(
+        REDIS_URL,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+    )
+    if REDIS_URL else None
+)
+
+
+def cached(key: str, ttl: int):
+    """
+    Cache kết quả của hàm đọc vào Redis.
+    `key` là chuỗi định dạng theo tên tham số của hàm, ví dụ "group:{group_id}:detail".
+    Kết quả được tuần tự hóa JSON và dựng lại theo kiểu trả về đã khai báo của hàm.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        return_type = get_type_hints(func)["return"]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if redis_client is None:
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            cache_key = key.format(**bound.arguments)
+            try:
+                raw = redis_client.get(cache_key)
+                if raw is not None:
+                    return parse_raw_as(return_type, raw)
+            except redis.RedisError as e:
+                logger.warning(f"Không đọc được cache {cache_key}: {e}")
+
+            result = func(*args, **kwargs)
+            try:
+                redis_client.set(cache_key, json.dumps(result, default=pydantic_encoder), ex=ttl)
+            except redis.RedisError as e:
+                logger.warning(f"Không ghi được cache {cache_key}: {e}")
+            return result
+
+        return wrapper
+    return decorator
+
+
+def invalidate(*keys: str):
+    """Xóa các khóa cache sau khi dữ liệu đã được ghi vào CSDL."""
+    if redis_client is None or not keys:
+        return
+    try:
+        redis_client.delete(*keys)
+    except redis.RedisError as e:
+        logger.warning(f"Không xóa được cache {keys}: {e}")
@@ -16,7 +16,16 @@ DATABASE_PASSWORD = os.getenv("DATABASE_PASSWORD")
 DATABASE_URL = f"postgresql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
 
 # Tạo engine và session
-engine = create_engine(DATABASE_URL)
+# FastAPI chạy các endpoint đồng bộ trong threadpool (mặc định 40 luồng), nên pool kết nối
+# cần đủ lớn để các request đồng thời không phải xếp hàng chờ kết nối (mặc định chỉ 5 + 10).
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True,
+    # Cache câu SQL đã biên dịch cho toàn bộ truy vấn của các service (mặc định chỉ 500 mục)
+    query_cache_size=1200,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Base class cho các model
@@ -28,4 +37,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
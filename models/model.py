@@ -1,6 +1,6 @@
 from datetime import datetime
 import uuid
-from sqlalchemy import UUID, Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text, func
+from sqlalchemy import UUID, Boolean, CheckConstraint, Column, DateTime, Float, ForeignKey, Integer, String, Text, UniqueConstraint, func
 from db.database import Base
 
 class AcademyYear(Base):
@@ -178,6 +178,9 @@ class ScoreType(Base):
 
 class Group(Base):
     __tablename__ = "group"
+    __table_args__ = (
+        CheckConstraint("quantity BETWEEN 1 AND 4", name="ck_group_quantity"),
+    )
     id = Column(UUID, primary_key=True, index=True, default=uuid.uuid4)
     name = Column(String, index=True)
     leader_id = Column(UUID, nullable=False)  # Người tạo nhóm (nhóm trưởng)
@@ -188,9 +191,12 @@ class Group(Base):
 
 class GroupMember(Base):
     __tablename__ = "group_member"
+    __table_args__ = (
+        UniqueConstraint("group_id", "student_id", name="uq_group_member_group_student"),
+    )
     id = Column(UUID, primary_key=True, index=True, default=uuid.uuid4)
     group_id = Column(UUID)
-    student_id = Column(UUID)
+    student_id = Column(UUID, index=True)
     is_leader = Column(Boolean, nullable=True)
     join_date  = Column(DateTime, default=func.now())
 
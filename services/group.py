@@ -1,21 +1,69 @@
+from sqlalchemy import and_, case, delete, exists, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from db.cache import cached, invalidate, redis_client
 from models.model import Group, GroupMember, Information, Invite, StudentInfo, Thesis
 from schemas.group import (
-    GroupCreate, GroupUpdate, GroupMemberCreate, 
+    GroupCreate, GroupUpdate, GroupMemberCreate, GroupMemberResponse, GroupResponse,
     GroupWithMembersResponse, MemberDetailResponse
 )
 from uuid import UUID
 from fastapi import HTTPException, status
-from typing import List
+from typing import Dict, Iterable, List, Optional
+
+# Khóa cache cho các API đọc; danh sách thành viên thay đổi thường xuyên nên TTL ngắn
+GROUP_DETAIL_CACHE_KEY = "group:{group_id}:detail"
+USER_GROUPS_CACHE_KEY = "user:{user_id}:groups"
+GROUP_CACHE_TTL = 10
 
 def is_member_of_any_group(db: Session, user_id: UUID):
     """Kiểm tra người dùng đã thuộc nhóm nào chưa"""
-    return db.query(GroupMember).filter(GroupMember.student_id == user_id).first() is not None
+    return db.query(exists().where(GroupMember.student_id == user_id)).scalar()
+
+# Chỉ lấy các cột cần cho MemberDetailResponse thay vì dựng cả đối tượng ORM Information/StudentInfo.
+# full_name được ghép sẵn trong SQL bằng toán tử || (trả về NULL khi thiếu Information).
+_MEMBER_DETAIL_COLUMNS = (
+    GroupMember.student_id,
+    GroupMember.is_leader,
+    (Information.last_name + " " + Information.first_name).label("full_name"),
+    StudentInfo.student_code,
+)
+
+def _member_detail_from_row(row) -> Optional[MemberDetailResponse]:
+    """Dựng MemberDetailResponse từ một dòng chứa _MEMBER_DETAIL_COLUMNS; trả về None nếu thiếu hồ sơ sinh viên"""
+    if row.full_name is None or row.student_code is None:
+        return None
+    return MemberDetailResponse(
+        user_id=row.student_id,
+        full_name=row.full_name,
+        student_code=row.student_code,
+        is_leader=row.is_leader or False
+    )
+
+def _raise_group_not_found_or_forbidden(db: Session, group_id: UUID, forbidden_detail: str):
+    """Phân biệt lỗi 404/403 sau khi câu lệnh ghi có điều kiện nhóm trưởng không tác động dòng nào"""
+    if db.query(Group.id).filter(Group.id == group_id).first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy nhóm.")
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=forbidden_detail)
+
+def _cached_user_ids_of_group(db: Session, group_id: UUID) -> List[UUID]:
+    """Lấy thành viên của nhóm để xóa cache; trả về rỗng khi cache bị tắt để không tốn thêm truy vấn"""
+    if redis_client is None:
+        return []
+    return [row.student_id for row in db.query(GroupMember.student_id).filter(GroupMember.group_id == group_id)]
+
+def invalidate_group_cache(db: Session, group_id: UUID, extra_user_ids: Iterable[UUID] = ()):
+    """Xóa cache chi tiết nhóm và danh sách nhóm của các thành viên liên quan (gọi sau khi commit)"""
+    user_ids = [*_cached_user_ids_of_group(db, group_id), *extra_user_ids]
+    invalidate(
+        GROUP_DETAIL_CACHE_KEY.format(group_id=group_id),
+        *(USER_GROUPS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids)
+    )
 
 def create_group(db: Session, group: GroupCreate, user_id: UUID):
     """Tạo nhóm mới và đặt người tạo làm nhóm trưởng"""
-    is_existing_member = db.query(GroupMember).filter(GroupMember.student_id == user_id).first()
-    if is_existing_member:
+    if is_member_of_any_group(db, user_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Bạn đã là thành viên của một nhóm khác, không thể tạo nhóm mới."
@@ -24,7 +72,6 @@ def create_group(db: Session, group: GroupCreate, user_id: UUID):
     new_group = Group(name=group.name, leader_id=user_id, quantity=1)
     db.add(new_group)
     db.flush()
-    db.refresh(new_group)
 
     group_leader = GroupMember(
         group_id=new_group.id,
@@ -32,63 +79,131 @@ def create_group(db: Session, group: GroupCreate, user_id: UUID):
         is_leader=True,
     )
     db.add(group_leader)
+    # Dựng kết quả trước khi commit: commit làm hết hạn đối tượng và đọc lại sẽ tốn thêm một SELECT
+    response = GroupResponse.from_orm(new_group)
     db.commit()
-    return new_group
+    invalidate(USER_GROUPS_CACHE_KEY.format(user_id=user_id))
+    return response
 
 def add_member(db: Session, group_id: UUID, member: GroupMemberCreate, leader_id: UUID):
     """Thêm thành viên vào nhóm (chỉ nhóm trưởng). Hàm này dành cho trường hợp thêm trực tiếp, không qua lời mời."""
-    # 1. Kiểm tra nhóm và quyền của người gọi
-    group = db.query(Group).filter(Group.id == group_id).first()
-    if not group:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy nhóm.")
-    if group.leader_id != leader_id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Chỉ nhóm trưởng mới có quyền thêm thành viên.")
+    # 1. Kiểm tra xem người được thêm đã ở trong nhóm khác chưa (chỉ đọc, chưa khóa dòng nào)
+    if is_member_of_any_group(db, member.student_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Thành viên này đã ở trong một nhóm khác.")
 
-    # 2. Kiểm tra giới hạn thành viên
-    if group.quantity >= 4:
+    # 2. Tăng số lượng nguyên tử: kiểm tra nhóm, quyền và giới hạn thành viên trong cùng một câu lệnh.
+    # Ràng buộc ck_group_quantity trong CSDL là lớp bảo vệ thứ hai.
+    try:
+        updated = db.execute(
+            update(Group)
+            .where(Group.id == group_id, Group.leader_id == leader_id, Group.quantity < 4)
+            .values(quantity=Group.quantity + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nhóm đã đủ số lượng thành viên.")
+    if updated == 0:
+        group = db.query(Group.leader_id).filter(Group.id == group_id).first()
+        if not group:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy nhóm.")
+        if group.leader_id != leader_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Chỉ nhóm trưởng mới có quyền thêm thành viên.")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nhóm đã đủ số lượng thành viên.")
 
-    # 3. Kiểm tra xem người được thêm đã ở trong nhóm khác chưa
-    if is_member_of_any_group(db, member.student_id):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Thành viên này đã ở trong một nhóm khác.")
-        
-    # 4. Thêm thành viên
+    # 3. Thêm thành viên trong cùng giao dịch
     new_member = GroupMember(group_id=group_id, student_id=member.student_id, is_leader=False)
     db.add(new_member)
-    
-    # 5. Cập nhật số lượng
-    group.quantity += 1
+    response = GroupMemberResponse.from_orm(new_member)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Ràng buộc uq_group_member_group_student: thành viên đã được thêm bởi một yêu cầu đồng thời
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Thành viên này đã ở trong nhóm.")
+    invalidate_group_cache(db, group_id)
+    return response
+
+def add_members_bulk(db: Session, group_id: UUID, student_ids: List[UUID]) -> int:
+    """
+    Thêm nhiều thành viên vào nhóm trong một câu lệnh INSERT (ví dụ khi nhiều lời mời được chấp nhận cùng lúc).
+    Hàm không kiểm tra quyền nhóm trưởng, nơi gọi phải tự kiểm tra. Trả về số thành viên thực sự được thêm.
+    """
+    student_ids = list(dict.fromkeys(student_ids))
+    if not student_ids:
+        return 0
+
+    # 1. Không ai trong danh sách được thuộc nhóm khác
+    if db.query(exists().where(GroupMember.student_id.in_(student_ids), GroupMember.group_id != group_id)).scalar():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Có thành viên đã ở trong một nhóm khác.")
+
+    # 2. Thêm tất cả trong một câu lệnh, bỏ qua người đã có trong nhóm (ràng buộc uq_group_member_group_student)
+    inserted_ids = db.execute(
+        pg_insert(GroupMember)
+        .values([{"group_id": group_id, "student_id": student_id, "is_leader": False} for student_id in student_ids])
+        .on_conflict_do_nothing(index_elements=["group_id", "student_id"])
+        .returning(GroupMember.student_id)
+    ).scalars().all()
+    added = len(inserted_ids)
+    if added == 0:
+        return 0
+
+    # 3. Tăng số lượng nguyên tử, vẫn đảm bảo giới hạn 4 thành viên (ck_group_quantity là lớp bảo vệ thứ hai)
+    try:
+        updated = db.execute(
+            update(Group)
+            .where(Group.id == group_id, Group.quantity + added <= 4)
+            .values(quantity=Group.quantity + added)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    except IntegrityError:
+        updated = 0
+    if updated == 0:
+        db.rollback()
+        if db.query(Group.id).filter(Group.id == group_id).first() is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy nhóm.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nhóm đã đủ số lượng thành viên (tối đa 4 người).")
+
     db.commit()
-    db.refresh(new_member)
-    return new_member
+    invalidate_group_cache(db, group_id)
+    return added
 
 def remove_member(db: Session, group_id: UUID, member_id: UUID, leader_id: UUID):
     """Xóa thành viên khỏi nhóm (chỉ nhóm trưởng)"""
-    # 1. Kiểm tra nhóm và quyền của người gọi
-    group = db.query(Group).filter(Group.id == group_id).first()
-    if not group:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy nhóm.")
-    if group.leader_id != leader_id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Chỉ nhóm trưởng mới có quyền xóa thành viên.")
-
-    # 2. Không cho phép xóa chính nhóm trưởng
+    # 1. Không cho phép xóa chính nhóm trưởng
     if member_id == leader_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Không thể xóa nhóm trưởng. Hãy chuyển quyền trước.")
 
-    # 3. Tìm và xóa thành viên
-    member_to_remove = db.query(GroupMember).filter(
+    # 2. Xóa thành viên, chỉ áp dụng khi người gọi là nhóm trưởng của nhóm
+    deleted = db.query(GroupMember).filter(
         GroupMember.group_id == group_id,
-        GroupMember.student_id == member_id
-    ).first()
+        GroupMember.student_id == member_id,
+        exists().where(Group.id == group_id, Group.leader_id == leader_id)
+    ).delete(synchronize_session=False)
 
-    if not member_to_remove:
+    if deleted == 0:
+        group = db.query(Group.leader_id).filter(Group.id == group_id).first()
+        if not group:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy nhóm.")
+        if group.leader_id != leader_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Chỉ nhóm trưởng mới có quyền xóa thành viên.")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy thành viên này trong nhóm.")
+
+    # 3. Giảm số lượng nguyên tử, chỉ khi thực sự có thành viên bị xóa
+    try:
+        db.execute(
+            update(Group)
+            .where(Group.id == group_id)
+            .values(quantity=Group.quantity - 1)
+            .execution_options(synchronize_session=False)
+        )
+    except IntegrityError:
+        # Vi phạm ck_group_quantity: số lượng trong CSDL không khớp với số thành viên thực tế
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Số lượng thành viên của nhóm không hợp lệ.")
     
-    db.delete(member_to_remove)
-    
-    # 4. Cập nhật số lượng
-    group.quantity -= 1
     db.commit()
+    invalidate_group_cache(db, group_id, extra_user_ids=[member_id])
     return {"message": "Xóa thành viên thành công."}
 
 def get_members(db: Session, group_id: UUID):
@@ -97,128 +212,120 @@ def get_members(db: Session, group_id: UUID):
 
 def transfer_leader(db: Session, group_id: UUID, new_leader_id: UUID, current_leader_id: UUID):
     """Chuyển quyền nhóm trưởng"""
-    # 1. Kiểm tra nhóm và quyền của người gọi
-    group = db.query(Group).filter(Group.id == group_id).first()
-    if not group:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy nhóm.")
-    if group.leader_id != current_leader_id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Chỉ nhóm trưởng hiện tại mới có thể chuyển quyền.")
-
-    # 2. Tìm thành viên cũ và mới
-    current_leader_member = db.query(GroupMember).filter(GroupMember.student_id == current_leader_id, GroupMember.group_id == group_id).first()
-    new_leader_member = db.query(GroupMember).filter(GroupMember.student_id == new_leader_id, GroupMember.group_id == group_id).first()
-
-    if not new_leader_member:
+    # 1. Đổi nhóm trưởng, chỉ áp dụng khi người gọi là nhóm trưởng hiện tại
+    updated = db.execute(
+        update(Group)
+        .where(Group.id == group_id, Group.leader_id == current_leader_id)
+        .values(leader_id=new_leader_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if updated == 0:
+        _raise_group_not_found_or_forbidden(db, group_id, "Chỉ nhóm trưởng hiện tại mới có thể chuyển quyền.")
+
+    # 2. Cập nhật cờ is_leader của thành viên cũ và mới trong một câu lệnh
+    leader_ids = {current_leader_id, new_leader_id}
+    updated_members = db.execute(
+        update(GroupMember)
+        .where(GroupMember.group_id == group_id, GroupMember.student_id.in_(leader_ids))
+        .values(is_leader=case((GroupMember.student_id == new_leader_id, True), else_=False))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    # Số dòng cập nhật ít hơn mong đợi: người được chuyển quyền không thuộc nhóm
+    if updated_members != len(leader_ids):
+        db.rollback()
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Người được chuyển quyền không phải là thành viên của nhóm.")
-
-    # 3. Cập nhật quyền
-    current_leader_member.is_leader = False
-    new_leader_member.is_leader = True
-    group.leader_id = new_leader_id
     
     db.commit()
+    invalidate_group_cache(db, group_id)
     return {"message": "Chuyển quyền nhóm trưởng thành công."}
 
 
+@cached(key=USER_GROUPS_CACHE_KEY, ttl=GROUP_CACHE_TTL)
 def get_all_groups_for_user(db: Session, user_id: UUID) -> List[GroupWithMembersResponse]:
     """
     Lấy thông tin TẤT CẢ các nhóm và danh sách thành viên của một user cụ thể.
+    Toàn bộ dữ liệu được lấy trong một câu truy vấn JOIN duy nhất.
     """
-    user_memberships = db.query(GroupMember).filter(GroupMember.student_id == user_id).all()
+    user_group_ids = db.query(GroupMember.group_id).filter(GroupMember.student_id == user_id)
+
+    rows = (
+        db.query(Group.id, Group.name, Group.leader_id, *_MEMBER_DETAIL_COLUMNS)
+        .join(GroupMember, GroupMember.group_id == Group.id)
+        .outerjoin(Information, Information.user_id == GroupMember.student_id)
+        .outerjoin(StudentInfo, StudentInfo.user_id == GroupMember.student_id)
+        .filter(Group.id.in_(user_group_ids))
+        .all()
+    )
 
-    if not user_memberships:
-        return []
+    groups_by_id: Dict[UUID, GroupWithMembersResponse] = {}
+    for row in rows:
+        group_obj = groups_by_id.get(row.id)
+        if group_obj is None:
+            group_obj = GroupWithMembersResponse(
+                id=row.id,
+                name=row.name,
+                leader_id=row.leader_id,
+                members=[]
+            )
+            groups_by_id[row.id] = group_obj
 
-    all_groups_list: List[GroupWithMembersResponse] = []
-    
-    for membership in user_memberships:
-        group_id = membership.group_id
-        group = db.query(Group).filter(Group.id == group_id).first()
-        if not group:
-            continue
-
-        all_members_in_group = db.query(GroupMember).filter(GroupMember.group_id == group_id).all()
-
-        member_details_list: List[MemberDetailResponse] = []
-        for member in all_members_in_group:
-            student_user_id = member.student_id
-            info = db.query(Information).filter(Information.user_id == student_user_id).first()
-            student_info = db.query(StudentInfo).filter(StudentInfo.user_id == student_user_id).first()
-
-            if info and student_info:
-                member_obj = MemberDetailResponse(
-                    user_id=student_user_id,
-                    full_name=f"{info.last_name} {info.first_name}",
-                    student_code=student_info.student_code,
-                    is_leader=member.is_leader or False
-                )
-                member_details_list.append(member_obj)
-
-        group_obj = GroupWithMembersResponse(
-            id=group.id,
-            name=group.name,
-            leader_id=group.leader_id,
-            members=member_details_list
-        )
-        all_groups_list.append(group_obj)
+        member_obj = _member_detail_from_row(row)
+        if member_obj:
+            group_obj.members.append(member_obj)
 
-    return all_groups_list
+    return list(groups_by_id.values())
 
 def update_group_name(db: Session, group_id: UUID, new_name: str, user_id: UUID):
     """Cập nhật tên của một nhóm (chỉ nhóm trưởng)"""
-    # 1. Tìm nhóm trong CSDL
-    group = db.query(Group).filter(Group.id == group_id).first()
-    if not group:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy nhóm.")
-
-    # 2. Kiểm tra quyền: người thực hiện phải là nhóm trưởng
-    if group.leader_id != user_id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Chỉ nhóm trưởng mới có quyền đổi tên nhóm.")
-
-    # 3. Cập nhật tên mới
-    group.name = new_name
+    # 1. Cập nhật tên mới, chỉ áp dụng khi người thực hiện là nhóm trưởng
+    group = db.execute(
+        update(Group)
+        .where(Group.id == group_id, Group.leader_id == user_id)
+        .values(name=new_name)
+        .returning(Group)
+    ).scalar_one_or_none()
+
+    # 2. Không có dòng nào được cập nhật: nhóm không tồn tại hoặc không có quyền
+    if group is None:
+        _raise_group_not_found_or_forbidden(db, group_id, "Chỉ nhóm trưởng mới có quyền đổi tên nhóm.")
+
+    # 3. Dựng kết quả từ dữ liệu RETURNING trước khi commit làm hết hạn đối tượng
+    response = GroupResponse.from_orm(group)
     db.commit()
-    db.refresh(group)
+    invalidate_group_cache(db, group_id)
     
-    return group
+    return response
 
-def get_detailed_members_of_group(db: Session, group_id: UUID) -> List[MemberDetailResponse]:
-    """Lấy danh sách thành viên chi tiết của một nhóm."""
-    group = db.query(Group).filter(Group.id == group_id).first()
-    if not group:
+def _get_group_and_members(db: Session, group_id: UUID):
+    """Lấy nhóm và danh sách thành viên chi tiết trong một câu truy vấn JOIN."""
+    rows = (
+        db.query(Group.id, Group.name, Group.leader_id, *_MEMBER_DETAIL_COLUMNS)
+        .outerjoin(GroupMember, GroupMember.group_id == Group.id)
+        .outerjoin(Information, Information.user_id == GroupMember.student_id)
+        .outerjoin(StudentInfo, StudentInfo.user_id == GroupMember.student_id)
+        .filter(Group.id == group_id)
+        .all()
+    )
+    if not rows:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy nhóm.")
 
-    all_members_in_group = db.query(GroupMember).filter(GroupMember.group_id == group_id).all()
-    
-    member_details_list: List[MemberDetailResponse] = []
-    for member in all_members_in_group:
-        student_user_id = member.student_id
-        info = db.query(Information).filter(Information.user_id == student_user_id).first()
-        student_info = db.query(StudentInfo).filter(StudentInfo.user_id == student_user_id).first()
-
-        if info and student_info:
-            member_obj = MemberDetailResponse(
-                user_id=student_user_id,
-                full_name=f"{info.last_name} {info.first_name}",
-                student_code=student_info.student_code,
-                is_leader=member.is_leader or False
-            )
-            member_details_list.append(member_obj)
-            
+    member_details_list = [member_obj for member_obj in map(_member_detail_from_row, rows) if member_obj]
+    return rows[0], member_details_list
+
+def get_detailed_members_of_group(db: Session, group_id: UUID) -> List[MemberDetailResponse]:
+    """Lấy danh sách thành viên chi tiết của một nhóm."""
+    _, member_details_list = _get_group_and_members(db, group_id)
     return member_details_list
 
 # HÀM MỚI ĐỂ GỘP THÔNG TIN NHÓM VÀ THÀNH VIÊN
+@cached(key=GROUP_DETAIL_CACHE_KEY, ttl=GROUP_CACHE_TTL)
 def get_group_with_detailed_members(db: Session, group_id: UUID) -> GroupWithMembersResponse:
     """Lấy thông tin chi tiết của nhóm và danh sách thành viên của nó."""
-    # 1. Lấy thông tin cơ bản của nhóm
-    group = db.query(Group).filter(Group.id == group_id).first()
-    if not group:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy nhóm.")
-        
-    # 2. Lấy danh sách thành viên chi tiết
-    members_list = get_detailed_members_of_group(db, group_id)
+    # 1. Lấy thông tin nhóm và danh sách thành viên chi tiết
+    group, members_list = _get_group_and_members(db, group_id)
     
-    # 3. Tạo đối tượng trả về hoàn chỉnh
+    # 2. Tạo đối tượng trả về hoàn chỉnh
     response = GroupWithMembersResponse(
         id=group.id,
         name=group.name,
@@ -231,7 +338,7 @@ def get_group_with_detailed_members(db: Session, group_id: UUID) -> GroupWithMem
 
 def delete_group(db: Session, group_id: UUID, user_id: UUID):
     """Xóa một nhóm và các thông tin liên quan (chỉ nhóm trưởng)"""
-    group = db.query(Group).filter(Group.id == group_id).first()
+    group = db.get(Group, group_id)
     if not group:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Không tìm thấy nhóm.")
 
@@ -241,39 +348,62 @@ def delete_group(db: Session, group_id: UUID, user_id: UUID):
     if group.thesis_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Không thể xóa nhóm đã được gán vào đề tài.")
 
-    # ... (phần còn lại của logic xóa giữ nguyên) ...
-    db.query(Invite).filter(Invite.group_id == group_id).delete(synchronize_session=False)
-    db.query(GroupMember).filter(GroupMember.group_id == group_id).delete(synchronize_session=False)
-    db.delete(group)
+    member_ids = _cached_user_ids_of_group(db, group_id)
+
+    # Xóa lời mời, thành viên và nhóm trong một câu lệnh (WITH ... DELETE) để chỉ tốn một lượt truy vấn
+    deleted_invites = delete(Invite).where(Invite.group_id == group_id).cte("deleted_invites")
+    deleted_members = delete(GroupMember).where(GroupMember.group_id == group_id).cte("deleted_members")
+    db.execute(
+        delete(Group)
+        .where(Group.id == group_id)
+        .add_cte(deleted_invites)
+        .add_cte(deleted_members)
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
+    invalidate_group_cache(db, group_id, extra_user_ids=member_ids)
     
     return {"message": "Đã xóa nhóm thành công."}
 
 def register_thesis_for_group(db: Session, group_id: UUID, thesis_id: UUID, user_id: UUID):
     """Đăng ký một đề tài cho nhóm (chỉ nhóm trưởng)"""
-    # 1. Kiểm tra nhóm và quyền nhóm trưởng
-    group = db.query(Group).filter(Group.id == group_id).first()
-    if not group:
-        raise HTTPException(status_code=404, detail="Không tìm thấy nhóm.")
-    if group.leader_id != user_id:
-        raise HTTPException(status_code=403, detail="Chỉ nhóm trưởng mới có quyền đăng ký đề tài.")
-    if group.thesis_id:
+    # 1. Gán đề tài cho nhóm, chỉ áp dụng khi người gọi là nhóm trưởng và nhóm chưa có đề tài
+    group = db.execute(
+        update(Group)
+        .where(Group.id == group_id, Group.leader_id == user_id, Group.thesis_id.is_(None))
+        .values(thesis_id=thesis_id)
+        .returning(Group)
+    ).scalar_one_or_none()
+    if group is None:
+        current = db.query(Group.leader_id, Group.thesis_id).filter(Group.id == group_id).first()
+        if not current:
+            raise HTTPException(status_code=404, detail="Không tìm thấy nhóm.")
+        if current.leader_id != user_id:
+            raise HTTPException(status_code=403, detail="Chỉ nhóm trưởng mới có quyền đăng ký đề tài.")
         raise HTTPException(status_code=400, detail="Nhóm này đã đăng ký đề tài khác.")
 
-    # 2. Kiểm tra đề tài
-    thesis = db.query(Thesis).filter(Thesis.id == thesis_id).first()
-    if not thesis:
+    # 2. Kiểm tra đề tài tồn tại và chưa có nhóm khác đăng ký trong cùng một truy vấn
+    thesis_row = (
+        db.query(Thesis.id, Group.id.label("taken_by_group_id"))
+        .outerjoin(Group, and_(Group.thesis_id == Thesis.id, Group.id != group_id))
+        .filter(Thesis.id == thesis_id)
+        .first()
+    )
+    if not thesis_row:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Không tìm thấy đề tài.")
-    
-    # 3. Kiểm tra xem đề tài đã có nhóm nào đăng ký chưa
-    is_thesis_taken = db.query(Group).filter(Group.thesis_id == thesis_id).first()
-    if is_thesis_taken:
+    if thesis_row.taken_by_group_id:
+        db.rollback()
         raise HTTPException(status_code=400, detail="Đề tài này đã được nhóm khác đăng ký.")
 
-    # 4. Gán đề tài cho nhóm và cập nhật trạng thái
-    group.thesis_id = thesis_id
-    thesis.status = 2 # Giả sử 2 là trạng thái "Đã đăng ký"
+    # 3. Cập nhật trạng thái đề tài trong cùng giao dịch
+    db.execute(
+        update(Thesis)
+        .where(Thesis.id == thesis_id)
+        .values(status=2) # Giả sử 2 là trạng thái "Đã đăng ký"
+        .execution_options(synchronize_session=False)
+    )
     
+    response = GroupResponse.from_orm(group)
     db.commit()
-    db.refresh(group)
-    return group
\ No newline at end of file
+    return response
\ No newline at end of file
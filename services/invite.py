@@ -1,8 +1,10 @@
 from typing import List
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
 from models.model import Information, Invite, StudentInfo
 from models.model import Group, GroupMember
 from models.model import User
+from services.group import invalidate_group_cache
 from schemas.invite import GroupInInviteResponse, InviteCreate, InviteDetailResponse, UserInInviteResponse
 from uuid import UUID
 from datetime import datetime
@@ -10,7 +12,7 @@ from fastapi import HTTPException, status
 
 def is_member_of_any_group(db: Session, user_id: UUID):
     """Kiểm tra người dùng đã thuộc nhóm nào chưa"""
-    return db.query(GroupMember).filter(GroupMember.student_id == user_id).first() is not None
+    return db.query(exists().where(GroupMember.student_id == user_id)).scalar()
 
 def send_invite(db: Session, invite: InviteCreate, sender_id: UUID):
     """Gửi lời mời tham gia nhóm (chưa tạo nhóm)."""
@@ -92,6 +94,7 @@ def accept_invite(db: Session, invite_id: UUID, receiver_id: UUID):
         leader_member = GroupMember(group_id=new_group.id, student_id=sender_id, is_leader=True)
         accepted_member = GroupMember(group_id=new_group.id, student_id=receiver_id, is_leader=False)
         db.add_all([leader_member, accepted_member])
+        joined_group_id = new_group.id
         invite.group_id = new_group.id
         invite.status = 2 
         db.query(Invite).filter(
@@ -105,10 +108,12 @@ def accept_invite(db: Session, invite_id: UUID, receiver_id: UUID):
         new_member = GroupMember(group_id=group.id, student_id=receiver_id, is_leader=False)
         db.add(new_member)
         group.quantity += 1
+        joined_group_id = group.id
         invite.group_id = group.id
         invite.status = 2
 
     db.commit()
+    invalidate_group_cache(db, joined_group_id)
     return {"message": "Lời mời đã được chấp nhận."}
 
 def revoke_invite(db: Session, invite_id: UUID, sender_id: UUID):
@@ -163,7 +168,7 @@ def get_all_invites_for_user(db: Session, user_id: UUID) -> dict:
 
     received_invites_list: List[InviteDetailResponse] = []
     for invite in received_invites_query:
-        group_info = db.query(Group).filter(Group.id == invite.group_id).first()
+        group_info = db.get(Group, invite.group_id) if invite.group_id else None
         received_invites_list.append(
             InviteDetailResponse(
                 id=invite.id,
@@ -181,7 +186,7 @@ def get_all_invites_for_user(db: Session, user_id: UUID) -> dict:
 
     sent_invites_list: List[InviteDetailResponse] = []
     for invite in sent_invites_query:
-        group_info = db.query(Group).filter(Group.id == invite.group_id).first()
+        group_info = db.get(Group, invite.group_id) if invite.group_id else None
         sent_invites_list.append(
             InviteDetailResponse(
                 id=invite.id,
@@ -0,0 +1,92 @@
+import os
+
+# db.database dựng URL PostgreSQL từ biến môi trường khi import; cache Redis bị tắt khi chạy test
+os.environ.setdefault("DATABASE_PORT", "5432")
+os.environ["REDIS_URL"] = ""
+
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import UUID, create_engine, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from db.database import Base
+from models.model import Information, StudentInfo
+
+
+@compiles(UUID, "sqlite")
+def compile_uuid_sqlite(type_, compiler, **kw):
+    """SQLite không có kiểu UUID, lưu dưới dạng chuỗi hex 32 ký tự"""
+    return "CHAR(32)"
+
+
+class QueryCounter:
+    """Số câu SQL đã gửi tới CSDL, được cập nhật bởi count_queries()"""
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def count_queries(engine, db):
+    """
+    Đếm các câu SQL được thực thi trong khối with, dùng để phát hiện lỗi N+1 truy vấn.
+    Identity map được làm trống trước khi đếm để không có truy vấn nào được phục vụ từ bộ nhớ.
+    """
+    @contextmanager
+    def _count_queries():
+        db.expunge_all()
+        counter = QueryCounter()
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            counter.count += 1
+            counter.statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield counter
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    return _count_queries
+
+
+@pytest.fixture
+def make_student(db):
+    """Tạo một sinh viên có đủ Information và StudentInfo, trả về user_id"""
+    def _make_student(index: int) -> uuid.UUID:
+        user_id = uuid.uuid4()
+        db.add(Information(
+            user_id=user_id,
+            first_name=f"Ten{index}",
+            last_name=f"Ho{index}",
+            date_of_birth=datetime(2003, 1, 1),
+            gender=1,
+            address="HCM",
+            tel_phone="0900000000",
+        ))
+        db.add(StudentInfo(user_id=user_id, student_code=f"SV{index:03d}", major_id=uuid.uuid4()))
+        db.commit()
+        return user_id
+
+    return _make_student
@@ -0,0 +1,201 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from models.model import Group, GroupMember, Thesis
+from schemas.group import GroupCreate, GroupMemberCreate
+from services.group import (
+    add_member, add_members_bulk, create_group, get_all_groups_for_user, get_group_with_detailed_members,
+    register_thesis_for_group, remove_member, transfer_leader, update_group_name
+)
+
+
+@pytest.fixture
+def group_with_members(db, make_student):
+    """Nhóm gồm nhóm trưởng và 2 thành viên"""
+    leader_id, *member_ids = [make_student(i) for i in range(3)]
+    group_id = create_group(db, GroupCreate(name="Nhóm A"), leader_id).id
+    for member_id in member_ids:
+        add_member(db, group_id, GroupMemberCreate(student_id=member_id), leader_id)
+    return group_id, leader_id, member_ids
+
+
+@pytest.fixture
+def make_thesis(db):
+    """Tạo một đề tài chưa có nhóm đăng ký, trả về id"""
+    def _make_thesis(title: str) -> uuid.UUID:
+        thesis = Thesis(
+            title=title, thesis_type=1, create_by=uuid.uuid4(),
+            batch_id=uuid.uuid4(), major_id=uuid.uuid4(), status=1
+        )
+        db.add(thesis)
+        db.commit()
+        return thesis.id
+
+    return _make_thesis
+
+
+def test_get_all_groups_for_user_uses_single_query(db, count_queries, group_with_members):
+    group_id, leader_id, member_ids = group_with_members
+
+    with count_queries() as counter:
+        groups = get_all_groups_for_user(db, member_ids[0])
+
+    assert counter.count == 1
+    assert [group.id for group in groups] == [group_id]
+    assert sorted(member.full_name for member in groups[0].members) == ["Ho0 Ten0", "Ho1 Ten1", "Ho2 Ten2"]
+
+
+def test_get_group_with_detailed_members_uses_single_query(db, count_queries, group_with_members):
+    group_id, leader_id, member_ids = group_with_members
+
+    with count_queries() as counter:
+        group = get_group_with_detailed_members(db, group_id)
+
+    assert counter.count == 1
+    assert group.leader_id == leader_id
+    assert {member.user_id: member.is_leader for member in group.members} == {
+        leader_id: True, member_ids[0]: False, member_ids[1]: False
+    }
+
+
+def test_transfer_leader_uses_two_queries(db, count_queries, group_with_members):
+    group_id, leader_id, member_ids = group_with_members
+
+    with count_queries() as counter:
+        transfer_leader(db, group_id, member_ids[0], leader_id)
+
+    assert counter.count == 2
+    group = get_group_with_detailed_members(db, group_id)
+    assert group.leader_id == member_ids[0]
+    assert {member.user_id for member in group.members if member.is_leader} == {member_ids[0]}
+
+
+def test_update_group_name_uses_single_query(db, count_queries, group_with_members):
+    group_id, leader_id, _ = group_with_members
+
+    with count_queries() as counter:
+        group = update_group_name(db, group_id, "Nhóm B", leader_id)
+
+    assert counter.count == 1
+    assert group.name == "Nhóm B"
+
+
+def test_add_member_rejects_full_group(db, make_student, group_with_members):
+    group_id, leader_id, _ = group_with_members
+    add_member(db, group_id, GroupMemberCreate(student_id=make_student(3)), leader_id)
+
+    with pytest.raises(HTTPException) as exc_info:
+        add_member(db, group_id, GroupMemberCreate(student_id=make_student(4)), leader_id)
+
+    assert exc_info.value.status_code == 400
+
+
+def test_remove_member_from_single_member_group(db, make_student):
+    leader_id = make_student(0)
+    group_id = create_group(db, GroupCreate(name="Nhóm A"), leader_id).id
+
+    with pytest.raises(HTTPException) as exc_info:
+        remove_member(db, group_id, make_student(1), leader_id)
+    assert exc_info.value.status_code == 404
+
+    with pytest.raises(HTTPException) as exc_info:
+        remove_member(db, group_id, leader_id, leader_id)
+    assert exc_info.value.status_code == 400
+
+
+def test_update_group_name_refreshes_group_loaded_in_session(db, group_with_members):
+    group_id, leader_id, _ = group_with_members
+    # Không dùng count_queries() ở đây: expunge_all sẽ làm trống identity map và che mất lỗi đối tượng cũ
+    loaded_group = db.get(Group, group_id)
+    assert loaded_group.name == "Nhóm A"
+
+    group = update_group_name(db, group_id, "Nhóm B", leader_id)
+
+    assert group.name == "Nhóm B"
+
+
+def test_add_member_rejects_student_of_another_group_without_writing(db, count_queries, make_student, group_with_members):
+    group_id, leader_id, _ = group_with_members
+    other_leader_id = make_student(3)
+    create_group(db, GroupCreate(name="Nhóm khác"), other_leader_id)
+
+    with count_queries() as counter:
+        with pytest.raises(HTTPException) as exc_info:
+            add_member(db, group_id, GroupMemberCreate(student_id=other_leader_id), leader_id)
+
+    assert exc_info.value.status_code == 400
+    assert not any(statement.lstrip().upper().startswith("UPDATE") for statement in counter.statements)
+    assert db.get(Group, group_id).quantity == 3
+
+
+def test_add_members_bulk_dedupes_and_skips_existing_members(db, make_student, group_with_members):
+    group_id, _, member_ids = group_with_members
+    new_id = make_student(3)
+
+    assert add_members_bulk(db, group_id, [new_id, member_ids[0], new_id]) == 1
+    assert db.get(Group, group_id).quantity == 4
+
+    assert add_members_bulk(db, group_id, [member_ids[0], new_id]) == 0
+    assert db.get(Group, group_id).quantity == 4
+
+
+def test_add_members_bulk_rolls_back_when_over_capacity(db, make_student, group_with_members):
+    group_id, _, _ = group_with_members
+
+    with pytest.raises(HTTPException) as exc_info:
+        add_members_bulk(db, group_id, [make_student(3), make_student(4)])
+
+    assert exc_info.value.status_code == 400
+    assert db.get(Group, group_id).quantity == 3
+    assert db.query(GroupMember).filter(GroupMember.group_id == group_id).count() == 3
+
+
+def test_register_thesis_for_group(db, make_thesis, group_with_members):
+    group_id, leader_id, _ = group_with_members
+    thesis_id = make_thesis("Đề tài A")
+
+    group = register_thesis_for_group(db, group_id, thesis_id, leader_id)
+
+    assert group.id == group_id
+    assert db.get(Group, group_id).thesis_id == thesis_id
+    assert db.get(Thesis, thesis_id).status == 2
+
+
+def test_register_thesis_for_group_error_precedence(db, make_thesis, group_with_members):
+    group_id, leader_id, member_ids = group_with_members
+    thesis_id = make_thesis("Đề tài A")
+
+    with pytest.raises(HTTPException) as exc_info:
+        register_thesis_for_group(db, uuid.uuid4(), thesis_id, leader_id)
+    assert exc_info.value.status_code == 404
+
+    with pytest.raises(HTTPException) as exc_info:
+        register_thesis_for_group(db, group_id, thesis_id, member_ids[0])
+    assert exc_info.value.status_code == 403
+
+    register_thesis_for_group(db, group_id, thesis_id, leader_id)
+    with pytest.raises(HTTPException) as exc_info:
+        register_thesis_for_group(db, group_id, make_thesis("Đề tài B"), leader_id)
+    assert exc_info.value.status_code == 400
+
+
+def test_register_thesis_for_group_rolls_back_when_thesis_unavailable(db, make_student, make_thesis, group_with_members):
+    group_id, leader_id, _ = group_with_members
+
+    with pytest.raises(HTTPException) as exc_info:
+        register_thesis_for_group(db, group_id, uuid.uuid4(), leader_id)
+    assert exc_info.value.status_code == 404
+    assert db.get(Group, group_id).thesis_id is None
+
+    other_leader_id = make_student(3)
+    other_group_id = create_group(db, GroupCreate(name="Nhóm khác"), other_leader_id).id
+    thesis_id = make_thesis("Đề tài A")
+    register_thesis_for_group(db, other_group_id, thesis_id, other_leader_id)
+
+    with pytest.raises(HTTPException) as exc_info:
+        register_thesis_for_group(db, group_id, thesis_id, leader_id)
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "Đề tài này đã được nhóm khác đăng ký."
+    assert db.get(Group, group_id).thesis_id is None